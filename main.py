@@ -7,24 +7,46 @@ Uses speech_recognition, pyttsx3, Wikipedia API, and more.
 
 import speech_recognition as sr
 import pyttsx3
+import ahocorasick
+import atexit
+import contextlib
 import datetime
+import functools
 import webbrowser
 import os
+import random
 import sys
 import time
 import subprocess
-import wikipedia
-import json
+import sqlite3
+import orjson
+import queue
 import re
 import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from pathlib import Path
 
+# Optional: low-latency streaming recognition (needs Google Cloud credentials)
+try:
+    from google.cloud import speech_v1 as cloud_speech
+    from google.api_core.exceptions import GoogleAPICallError
+except ImportError:
+    cloud_speech = None
+
+# Optional: fully on-device recognition (preferred when a model is present)
+try:
+    import vosk
+except ImportError:
+    vosk = None
+
 # -----------------------------------------------------
 # CONFIGURATION
 # -----------------------------------------------------
 CONFIG_FILE = Path(__file__).parent / "data" / "config.json"
 NOTES_FILE  = Path(__file__).parent / "data" / "notes.txt"
-TODO_FILE   = Path(__file__).parent / "data" / "todo.json"
+TODO_FILE   = Path(__file__).parent / "data" / "todo.jsonl"
+LEGACY_TODO_FILE = Path(__file__).parent / "data" / "todo.json"
+WIKI_CACHE_FILE = Path(__file__).parent / "data" / "wiki_cache.sqlite"
 
 DEFAULT_CONFIG = {
     "assistant_name": "Aria",
@@ -32,11 +54,16 @@ DEFAULT_CONFIG = {
     "voice_rate": 175,
     "voice_volume": 1.0,
     "language": "en-US",
-    "pause_threshold": 0.8,
+    "pause_threshold": 0.4,
+    "phrase_threshold": 0.15,
+    "non_speaking_duration": 0.2,
     "energy_threshold": 300,
     "dynamic_energy": True,
     "timeout": 5,
-    "phrase_time_limit": 10
+    "phrase_time_limit": 10,
+    "recalibrate_interval": 300,
+    "streaming_stt": True,
+    "vosk_model": "models/vosk-model-small-en-us"
 }
 
 
@@ -46,46 +73,348 @@ DEFAULT_CONFIG = {
 def load_config() -> dict:
     CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
     if CONFIG_FILE.exists():
-        with open(CONFIG_FILE) as f:
-            cfg = json.load(f)
+        with open(CONFIG_FILE, "rb") as f:
+            cfg = orjson.loads(f.read())
         # Fill in any missing keys from defaults
         for k, v in DEFAULT_CONFIG.items():
             cfg.setdefault(k, v)
         return cfg
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(DEFAULT_CONFIG, f, indent=4)
+    with open(CONFIG_FILE, "wb") as f:
+        f.write(orjson.dumps(DEFAULT_CONFIG, option=orjson.OPT_INDENT_2))
     return DEFAULT_CONFIG.copy()
 
 
+# Config changes are flushed off the main thread; set the event to request a write
+_CONFIG_DIRTY = threading.Event()
+_CONFIG_WRITE_LOCK = threading.Lock()
+
+
+def _flush_config() -> None:
+    """Write CONFIG atomically (tempfile + rename) so a crash never leaves it torn."""
+    with _CONFIG_WRITE_LOCK:
+        _CONFIG_DIRTY.clear()
+        tmp = CONFIG_FILE.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(CONFIG, option=orjson.OPT_INDENT_2))
+        os.replace(tmp, CONFIG_FILE)
+
+
+def _config_flusher() -> None:
+    while True:
+        _CONFIG_DIRTY.wait()
+        try:
+            _flush_config()
+        except OSError as e:
+            # e.g. file locked by another process, or disk full: retry shortly
+            print(f"   [ConfigError] {e}")
+            _CONFIG_DIRTY.set()
+            time.sleep(5)
+
+
+def _save_config() -> None:
+    _CONFIG_DIRTY.set()
+
+
+def _flush_config_at_exit() -> None:
+    # Wait out any write already in flight, then flush whatever is still pending
+    with _CONFIG_WRITE_LOCK:
+        pass
+    if _CONFIG_DIRTY.is_set():
+        try:
+            _flush_config()
+        except OSError as e:
+            print(f"   [ConfigError] {e}")
+
+
+def _count_lines(path: Path) -> int:
+    if not path.exists():
+        return 0
+    with open(path, "rb") as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 16), b""))
+
+
+def _sync_note_count() -> None:
+    """
+    Recount notes only if notes.txt no longer has the size we last recorded
+    (edited or deleted by hand, or a crash before the count was saved).
+    """
+    size = NOTES_FILE.stat().st_size if NOTES_FILE.exists() else 0
+    if "note_count" not in CONFIG or CONFIG.get("note_bytes") != size:
+        CONFIG["note_count"] = _count_lines(NOTES_FILE)
+        CONFIG["note_bytes"] = size
+        _save_config()
+
+
 CONFIG = load_config()
+# Notes are counted here only when needed, then tracked incrementally by cmd_write_note
+_sync_note_count()
 
-# Text-to-Speech engine
-engine = pyttsx3.init()
-engine.setProperty("rate",   CONFIG["voice_rate"])
-engine.setProperty("volume", CONFIG["voice_volume"])
+threading.Thread(target=_config_flusher, daemon=True).start()
+# Don't lose a pending change if we exit before the flusher gets to it
+atexit.register(_flush_config_at_exit)
 
-# Choose a voice (prefer a female voice if available)
-voices = engine.getProperty("voices")
-for v in voices:
-    if "female" in v.name.lower() or "zira" in v.name.lower() or "samantha" in v.name.lower():
-        engine.setProperty("voice", v.id)
-        break
+# Text-to-Speech engine (created on the TTS worker thread, see below)
+engine = None
+_TTS_READY = threading.Event()
+
+
+def _init_engine() -> None:
+    global engine
+    engine = pyttsx3.init()
+    engine.setProperty("rate",   CONFIG["voice_rate"])
+    engine.setProperty("volume", CONFIG["voice_volume"])
+
+    # Choose a voice (prefer a female voice if available)
+    voices = engine.getProperty("voices")
+    for v in voices:
+        if "female" in v.name.lower() or "zira" in v.name.lower() or "samantha" in v.name.lower():
+            engine.setProperty("voice", v.id)
+            break
+
+
+# Utterances are spoken on a worker thread so the main loop never waits on TTS.
+# pyttsx3's macOS driver (nsss) hangs off the main thread, so there we speak inline.
+TTS_Q = queue.Queue()
+TTS_INLINE = sys.platform == "darwin"
+_SPEAKING = threading.Event()   # set while an utterance is playing
+
+
+def _say(text: str) -> None:
+    """Speak one utterance on the current thread; errors are logged, not raised."""
+    if engine is None:
+        return
+    _SPEAKING.set()
+    try:
+        engine.say(text)
+        engine.runAndWait()
+    except Exception as e:
+        print(f"   [TTSError] {e}")
+    finally:
+        _SPEAKING.clear()
+
+
+def _start_tts() -> None:
+    try:
+        if sys.platform == "win32":
+            import comtypes
+            comtypes.CoInitialize()   # SAPI5 is COM; initialise it on this thread
+        _init_engine()
+    except Exception as e:
+        print(f"   [TTSError] {e}")   # carry on text-only
+    finally:
+        _TTS_READY.set()
+
+
+def _tts_worker() -> None:
+    _start_tts()
+    while True:
+        text = TTS_Q.get()
+        try:
+            _say(text)
+        finally:
+            TTS_Q.task_done()
+
+
+if TTS_INLINE:
+    _start_tts()
+else:
+    threading.Thread(target=_tts_worker, daemon=True).start()
+
+# Shared pool for network / browser work that can overlap with speech
+EXECUTOR = ThreadPoolExecutor(max_workers=4)
 
 # Speech recogniser
 recogniser = sr.Recognizer()
 recogniser.pause_threshold   = CONFIG["pause_threshold"]
 recogniser.energy_threshold  = CONFIG["energy_threshold"]
 recogniser.dynamic_energy_threshold = CONFIG["dynamic_energy"]
+recogniser.non_speaking_duration = CONFIG["non_speaking_duration"]
+recogniser.phrase_threshold  = CONFIG["phrase_threshold"]
+
+# Speech recognisers only need 16 kHz mono; small chunks keep end-of-speech snappy
+MIC_SAMPLE_RATE = 16000
+MIC_CHUNK       = 1024
+
+# The microphone is opened and calibrated once, then reused for every turn
+MIC = None
+_MIC_LOCK  = threading.Lock()    # held while a listen() is in flight
+_MIC_READY = threading.Event()   # set once warm-up has finished (or failed)
+_mic_thread = None
+_mic_error  = None
+
+# Streaming recognition is used only when the Cloud client is installed
+USE_STREAMING_STT = cloud_speech is not None and CONFIG["streaming_stt"]
+_speech_client = None
+
+# On-device Vosk model, loaded on its own thread during warm-up if available
+VOSK_MODEL = None
+_VOSK_READY = threading.Event()
 
 
 # ──────────────────────────────────────────────
 # CORE I/O
 # ──────────────────────────────────────────────
 def speak(text: str) -> None:
-    """Convert text to audible speech and print it."""
+    """Print text and queue it for speech without waiting (speaks inline on macOS)."""
     print(f"\n🤖 {CONFIG['assistant_name']}: {text}")
-    engine.say(text)
-    engine.runAndWait()
+    if TTS_INLINE:
+        _say(text)
+    else:
+        TTS_Q.put(text)
+
+
+def speak_sync(text: str) -> None:
+    """Like speak(), but return only once everything queued has been spoken."""
+    speak(text)
+    TTS_Q.join()
+
+
+def _capture_frames(source, frames: queue.Queue, stop: threading.Event,
+                    heard: threading.Event) -> None:
+    """
+    Push raw PCM chunks from an open microphone onto a queue until stopped.
+    Gives up after CONFIG["timeout"] if the recogniser hasn't heard anything.
+    """
+    start = time.monotonic()
+    while not stop.is_set():
+        elapsed = time.monotonic() - start
+        if elapsed > CONFIG["timeout"] + CONFIG["phrase_time_limit"]:
+            break
+        if not heard.is_set() and elapsed > CONFIG["timeout"]:
+            break
+        frames.put(source.stream.read(source.CHUNK))
+    frames.put(None)
+
+
+def _streaming_recognize(source) -> str:
+    """
+    Stream microphone audio to Google Cloud Speech while it is being captured.
+    Returns the first final transcript, or an empty string if nothing was heard.
+    """
+    global _speech_client
+    if _speech_client is None:
+        _speech_client = cloud_speech.SpeechClient()
+
+    config = cloud_speech.StreamingRecognitionConfig(
+        config=cloud_speech.RecognitionConfig(
+            encoding=cloud_speech.RecognitionConfig.AudioEncoding.LINEAR16,
+            sample_rate_hertz=source.SAMPLE_RATE,
+            language_code=CONFIG["language"],
+        ),
+        single_utterance=True,
+        interim_results=True,
+    )
+
+    frames = queue.Queue()
+    stop = threading.Event()
+    heard = threading.Event()
+    capture = threading.Thread(
+        target=_capture_frames, args=(source, frames, stop, heard), daemon=True
+    )
+    capture.start()
+    audio_requests = (
+        cloud_speech.StreamingRecognizeRequest(audio_content=chunk)
+        for chunk in iter(frames.get, None)
+    )
+    try:
+        for response in _speech_client.streaming_recognize(config, audio_requests):
+            if response.results:
+                heard.set()
+            for result in response.results:
+                if result.is_final and result.alternatives:
+                    return result.alternatives[0].transcript
+        return ""
+    finally:
+        stop.set()
+        capture.join()
+
+
+def _vosk_recognize(source) -> str:
+    """
+    Recognise one utterance on-device from raw microphone frames.
+    Returns an empty string if nothing was said before the timeout.
+    """
+    rec = vosk.KaldiRecognizer(VOSK_MODEL, source.SAMPLE_RATE)
+    start = time.monotonic()
+    heard = False
+    while True:
+        elapsed = time.monotonic() - start
+        if elapsed > CONFIG["timeout"] + CONFIG["phrase_time_limit"]:
+            break
+        if not heard and elapsed > CONFIG["timeout"]:
+            return ""
+        if rec.AcceptWaveform(source.stream.read(source.CHUNK)):
+            text = orjson.loads(rec.Result())["text"]
+            if text:
+                return text
+        elif orjson.loads(rec.PartialResult())["partial"]:
+            heard = True
+    return orjson.loads(rec.FinalResult())["text"]
+
+
+def _load_vosk_model() -> None:
+    global VOSK_MODEL
+    model_dir = Path(__file__).parent / CONFIG["vosk_model"]
+    if vosk is None or not CONFIG["vosk_model"] or not model_dir.is_dir():
+        _VOSK_READY.set()
+        return
+    try:
+        vosk.SetLogLevel(-1)
+        VOSK_MODEL = vosk.Model(str(model_dir))
+    except Exception as e:
+        print(f"   [VoskError] {e} — falling back to Google speech recognition.")
+    finally:
+        _VOSK_READY.set()
+
+
+def _recalibrate_loop() -> None:
+    """Periodically re-measure ambient noise while the assistant is idle."""
+    while True:
+        time.sleep(CONFIG["recalibrate_interval"])
+        if TTS_Q.unfinished_tasks or _SPEAKING.is_set() or not _MIC_LOCK.acquire(blocking=False):
+            continue
+        try:
+            _drain_microphone()   # don't calibrate on our own last reply
+            recogniser.adjust_for_ambient_noise(MIC, duration=0.5)
+        finally:
+            _MIC_LOCK.release()
+
+
+def _open_microphone() -> None:
+    global MIC, _mic_error
+    try:
+        try:
+            MIC = sr.Microphone(sample_rate=MIC_SAMPLE_RATE, chunk_size=MIC_CHUNK)
+            MIC.__enter__()
+        except OSError:
+            # Device can't capture at 16 kHz: use its native rate, downsample later
+            MIC = sr.Microphone(chunk_size=MIC_CHUNK)
+            MIC.__enter__()
+        atexit.register(MIC.__exit__, None, None, None)
+        recogniser.adjust_for_ambient_noise(MIC, duration=0.5)
+        if CONFIG["recalibrate_interval"] > 0:
+            threading.Thread(target=_recalibrate_loop, daemon=True).start()
+    except Exception as e:
+        MIC, _mic_error = None, e
+    finally:
+        _MIC_READY.set()
+
+
+def _drain_microphone() -> None:
+    """Discard audio buffered between turns (e.g. our own speech) before listening."""
+    stream = MIC.stream.pyaudio_stream
+    stale = stream.get_read_available()
+    if stale > 0:
+        stream.read(stale, exception_on_overflow=False)
+
+
+def warm_up_microphone() -> None:
+    """Open and calibrate the microphone, and load Vosk, in the background (idempotent)."""
+    global _mic_thread
+    if _mic_thread is None:
+        _mic_thread = threading.Thread(target=_open_microphone, daemon=True)
+        _mic_thread.start()
+        threading.Thread(target=_load_vosk_model, daemon=True).start()
 
 
 def listen(prompt: str = "") -> str:
@@ -93,15 +422,41 @@ def listen(prompt: str = "") -> str:
     Capture microphone input and return the recognised text.
     Returns an empty string on failure.
     """
+    global USE_STREAMING_STT
     if prompt:
         speak(prompt)
 
-    with sr.Microphone() as source:
+    # Don't let our own voice bleed into the recording
+    TTS_Q.join()
+    warm_up_microphone()
+    _MIC_READY.wait()
+    if MIC is None:
+        speak("I can't access the microphone. Try running me with --text.")
+        print(f"   [MicError] {_mic_error}")
+        return ""
+
+    _VOSK_READY.wait()
+    with _MIC_LOCK:
+        _drain_microphone()
         print("\n🎤 Listening...")
-        recogniser.adjust_for_ambient_noise(source, duration=0.5)
+        if VOSK_MODEL is not None:
+            return _heard(_vosk_recognize(MIC))
+
+        if USE_STREAMING_STT:
+            try:
+                return _heard(_streaming_recognize(MIC))
+            except GoogleAPICallError as e:
+                speak("I'm having trouble reaching the speech service. Please check your internet.")
+                print(f"   [RequestError] {e}")
+                return ""
+            except Exception as e:
+                # Usually missing credentials: use the free Google endpoint from now on
+                print(f"   [StreamingError] {e} — falling back to Google Web Speech.")
+                USE_STREAMING_STT = False
+
         try:
             audio = recogniser.listen(
-                source,
+                MIC,
                 timeout=CONFIG["timeout"],
                 phrase_time_limit=CONFIG["phrase_time_limit"]
             )
@@ -109,6 +464,10 @@ def listen(prompt: str = "") -> str:
             print("⚠️  No speech detected (timeout).")
             return ""
 
+    if audio.sample_rate > MIC_SAMPLE_RATE:
+        audio = sr.AudioData(
+            audio.get_raw_data(convert_rate=MIC_SAMPLE_RATE), MIC_SAMPLE_RATE, audio.sample_width
+        )
     try:
         query = recogniser.recognize_google(audio, language=CONFIG["language"])
         print(f"👤 {CONFIG['user_name']}: {query}")
@@ -122,6 +481,15 @@ def listen(prompt: str = "") -> str:
         return ""
 
 
+def _heard(query: str) -> str:
+    """Echo a transcript from a streaming recogniser and normalise it."""
+    if not query:
+        print("⚠️  No speech detected.")
+        return ""
+    print(f"👤 {CONFIG['user_name']}: {query}")
+    return query.lower().strip()
+
+
 def take_text_input(prompt: str = "Type your command: ") -> str:
     """Fallback: get command from keyboard."""
     return input(f"\n⌨️  {prompt}").lower().strip()
@@ -131,6 +499,11 @@ def take_text_input(prompt: str = "Type your command: ") -> str:
 # GREETINGS
 # ──────────────────────────────────────────────
 def wish_me() -> None:
+    # Don't let the greeting leak into an ambient-noise calibration in progress
+    _TTS_READY.wait()
+    if _mic_thread is not None:
+        _MIC_READY.wait()
+
     hour = datetime.datetime.now().hour
     if 5 <= hour < 12:
         greeting = "Good morning"
@@ -184,133 +557,374 @@ def cmd_open_site(query: str) -> None:
     speak("Which website would you like me to open?")
 
 
+SEARCH_GOOGLE_STRIP = re.compile(r"(search|google|for|on)")
+
 def cmd_search_google(query: str) -> None:
     # Extract search term after "search" / "google"
-    term = re.sub(r"(search|google|for|on)", "", query).strip()
+    term = SEARCH_GOOGLE_STRIP.sub("", query).strip()
     if not term:
         term = listen("What would you like me to search for?")
     if term:
+        EXECUTOR.submit(webbrowser.open, f"https://www.google.com/search?q={term.replace(' ', '+')}")
         speak(f"Searching Google for: {term}")
-        webbrowser.open(f"https://www.google.com/search?q={term.replace(' ', '+')}")
 
 
+SEARCH_YOUTUBE_STRIP = re.compile(r"(youtube|search|play|video|for)")
+
 def cmd_search_youtube(query: str) -> None:
-    term = re.sub(r"(youtube|search|play|video|for)", "", query).strip()
+    term = SEARCH_YOUTUBE_STRIP.sub("", query).strip()
     if not term:
         term = listen("What would you like to search on YouTube?")
     if term:
+        EXECUTOR.submit(webbrowser.open, f"https://www.youtube.com/results?search_query={term.replace(' ', '+')}")
         speak(f"Searching YouTube for: {term}")
-        webbrowser.open(f"https://www.youtube.com/results?search_query={term.replace(' ', '+')}")
 
 
 # --- Wikipedia ---
+WIKI_LANG = "en"
+WIKI_HTTP_TIMEOUT = 8   # seconds; below cmd_wikipedia's 10 s wait so workers never hang
+
+
+@functools.lru_cache(maxsize=None)
+def _wiki():
+    """Import and configure the wikipedia module on first use (it pulls in bs4 + requests)."""
+    import requests
+    import wikipedia
+
+    class _KeepAliveRequests:
+        """
+        Stand-in for the requests module inside wikipedia: keep-alive connections
+        with a default timeout. requests.Session isn't thread-safe, so each
+        executor thread gets its own.
+        """
+        _local = threading.local()
+
+        def get(self, *args, **kwargs):
+            session = getattr(self._local, "session", None)
+            if session is None:
+                session = self._local.session = requests.Session()
+            kwargs.setdefault("timeout", WIKI_HTTP_TIMEOUT)
+            return session.get(*args, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(requests, name)
+
+    wikipedia.set_lang(WIKI_LANG)
+    wikipedia.wikipedia.requests = _KeepAliveRequests()
+    return wikipedia
+
+
+WIKI_CACHE_TTL = 30 * 24 * 3600   # seconds before a cached summary is refetched
+
+
+@functools.lru_cache(maxsize=None)
+def _wiki_cache_init() -> None:
+    """Create the cache schema once, on first use."""
+    WIKI_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with contextlib.closing(sqlite3.connect(WIKI_CACHE_FILE)) as db, db:
+        db.execute("CREATE TABLE IF NOT EXISTS wiki_cache (key TEXT PRIMARY KEY, summary TEXT, ts INTEGER)")
+
+
+def _wiki_cache_get(key: str):
+    _wiki_cache_init()
+    with contextlib.closing(sqlite3.connect(WIKI_CACHE_FILE)) as db:
+        row = db.execute(
+            "SELECT summary FROM wiki_cache WHERE key = ? AND ts > ?",
+            (key, int(time.time()) - WIKI_CACHE_TTL)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def _wiki_cache_put(key: str, summary: str) -> None:
+    _wiki_cache_init()
+    with contextlib.closing(sqlite3.connect(WIKI_CACHE_FILE)) as db, db:
+        db.execute(
+            "INSERT OR REPLACE INTO wiki_cache (key, summary, ts) VALUES (?, ?, ?)",
+            (key, summary, int(time.time()))
+        )
+
+
+@functools.lru_cache(maxsize=512)
+def _wiki_summary(topic: str, sentences: int, lang: str) -> str:
+    """Wikipedia summary, memoised in memory and persisted in SQLite."""
+    key = f"{lang}|{sentences}|{topic}"
+    summary = _wiki_cache_get(key)
+    if summary is None:
+        summary = _wiki().summary(topic, sentences=sentences, auto_suggest=True)
+        _wiki_cache_put(key, summary)
+    return summary
+
+
+WIKIPEDIA_STRIP = re.compile(r"(wikipedia|wiki|who is|what is|tell me about|search)")
+
 def cmd_wikipedia(query: str) -> None:
-    topic = re.sub(r"(wikipedia|wiki|who is|what is|tell me about|search)", "", query).strip()
+    topic = WIKIPEDIA_STRIP.sub("", query).strip()
     if not topic:
         topic = listen("What topic would you like me to look up on Wikipedia?")
     if not topic:
         return
+    # Start the lookup first so the request is in flight while we talk
+    future = EXECUTOR.submit(_wiki_summary, topic, 3, WIKI_LANG)
     speak(f"Searching Wikipedia for: {topic}")
     try:
-        wikipedia.set_lang("en")
-        summary = wikipedia.summary(topic, sentences=3, auto_suggest=True)
+        summary = future.result(timeout=10)
         speak(summary)
-    except wikipedia.DisambiguationError as e:
-        options = e.options[:4]
-        speak(f"There are multiple results. Did you mean: {', '.join(options)}?")
-    except wikipedia.PageError:
-        speak("I couldn't find a Wikipedia page for that topic.")
+    except FutureTimeout:
+        speak("Wikipedia is taking too long to respond. Please try again later.")
     except Exception as e:
-        speak("Something went wrong while fetching Wikipedia.")
-        print(f"   [WikiError] {e}")
+        # Only look at wikipedia's error types if the lazy import actually succeeded
+        wiki = sys.modules.get("wikipedia")
+        if wiki is not None and isinstance(e, wiki.DisambiguationError):
+            options = e.options[:4]
+            speak(f"There are multiple results. Did you mean: {', '.join(options)}?")
+        elif wiki is not None and isinstance(e, wiki.PageError):
+            speak("I couldn't find a Wikipedia page for that topic.")
+        else:
+            speak("Something went wrong while fetching Wikipedia.")
+            print(f"   [WikiError] {e}")
 
 
 # --- Notes ---
+WRITE_NOTE_STRIP = re.compile(r"(write|take|make|a|note|saying|that)")
+
 def cmd_write_note(query: str) -> None:
     NOTES_FILE.parent.mkdir(parents=True, exist_ok=True)
-    note = re.sub(r"(write|take|make|a|note|saying|that)", "", query).strip()
+    note = WRITE_NOTE_STRIP.sub("", query).strip()
     if not note:
         note = listen("What would you like to note down?")
     if note:
         timestamp = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M]")
+        _sync_note_count()
         with open(NOTES_FILE, "a") as f:
             f.write(f"{timestamp} {note}\n")
+        CONFIG["note_count"] += 1
+        CONFIG["note_bytes"] = NOTES_FILE.stat().st_size
+        _save_config()
         speak("Note saved!")
 
 
+def _tail(path: Path, n: int) -> list:
+    """Return the last *n* non-empty lines of a file, reading only from the end."""
+    size = path.stat().st_size
+    block = 8192
+    with open(path, "rb") as f:
+        while True:
+            start = max(0, size - block)
+            f.seek(start)
+            lines = [line for line in f.read().splitlines() if line.strip()]
+            # The first line may be cut mid-way, so only trust it at offset 0
+            if start == 0 or len(lines) > n:
+                break
+            block *= 2
+    return [line.decode(errors="replace") for line in lines[-n:]]
+
+
 def cmd_read_notes(_: str) -> None:
     if not NOTES_FILE.exists() or NOTES_FILE.stat().st_size == 0:
         speak("You have no notes saved.")
         return
-    with open(NOTES_FILE) as f:
-        notes = f.readlines()
-    speak(f"You have {len(notes)} note(s).")
-    for i, note in enumerate(notes[-5:], 1):   # read last 5
-        speak(f"Note {i}: {note.strip()}")
+    _sync_note_count()
+    notes = _tail(NOTES_FILE, 5)   # read last 5
+    # One utterance instead of one per note; ". " gives natural pauses
+    parts = [f"You have {CONFIG['note_count']} note(s)."]
+    parts += [f"Note {i}: {note.strip()}." for i, note in enumerate(notes, 1)]
+    speak(" ".join(parts))
 
 
 # --- To-Do List ---
+# Tasks live in memory; adds append one JSONL line, other edits compact the file
+_TODO_LOCK = threading.Lock()
+
+
 def _load_todos() -> list:
     TODO_FILE.parent.mkdir(parents=True, exist_ok=True)
     if TODO_FILE.exists():
-        with open(TODO_FILE) as f:
-            return json.load(f)
+        todos = []
+        with open(TODO_FILE, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    todos.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    # Most likely a line torn by a crash mid-append
+                    print(f"   [TodoError] Skipping unreadable entry: {line[:40]!r}")
+        return todos
+    if LEGACY_TODO_FILE.exists():
+        with open(LEGACY_TODO_FILE, "rb") as f:
+            todos = orjson.loads(f.read())
+        with _TODO_LOCK:
+            _write_todos(todos)
+        return todos
     return []
 
 
-def _save_todos(todos: list) -> None:
-    with open(TODO_FILE, "w") as f:
-        json.dump(todos, f, indent=2)
+def _write_todos(todos: list) -> None:
+    """Rewrite the whole to-do file atomically. Caller must hold _TODO_LOCK."""
+    tmp = TODO_FILE.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.writelines(orjson.dumps(t) + b"\n" for t in todos)
+    os.replace(tmp, TODO_FILE)
+
+
+def _save_todos() -> None:
+    """Compact the to-do file from the current in-memory list."""
+    with _TODO_LOCK:
+        _write_todos(list(TODOS))
 
 
+def _append_todo(entry: dict) -> None:
+    with _TODO_LOCK:
+        TODOS.append(entry)
+        with open(TODO_FILE, "ab") as f:
+            f.write(orjson.dumps(entry) + b"\n")
+
+
+TODOS = _load_todos()
+
+
+ADD_TODO_STRIP = re.compile(r"(add|to do|todo|task|reminder|remind me to)")
+
 def cmd_add_todo(query: str) -> None:
-    task = re.sub(r"(add|to do|todo|task|reminder|remind me to)", "", query).strip()
+    task = ADD_TODO_STRIP.sub("", query).strip()
     if not task:
         task = listen("What task would you like to add?")
     if task:
-        todos = _load_todos()
-        todos.append({"task": task, "done": False, "added": str(datetime.datetime.now())})
-        _save_todos(todos)
+        entry = {"task": task, "done": False, "added": str(datetime.datetime.now())}
+        _append_todo(entry)
         speak(f"Added to your to-do list: {task}")
 
 
 def cmd_read_todos(_: str) -> None:
-    todos = _load_todos()
-    pending = [t for t in todos if not t["done"]]
+    pending = [t for t in TODOS if not t["done"]]
     if not pending:
         speak("Your to-do list is empty.")
         return
-    speak(f"You have {len(pending)} pending task(s).")
-    for i, t in enumerate(pending, 1):
-        speak(f"{i}. {t['task']}")
+    parts = [f"You have {len(pending)} pending task(s)."]
+    parts += [f"{i}. {t['task']}." for i, t in enumerate(pending, 1)]
+    speak(" ".join(parts))
+
 
+DIGITS = re.compile(r"\d+")
 
 def cmd_complete_todo(_: str) -> None:
-    todos = _load_todos()
-    pending = [t for t in todos if not t["done"]]
+    pending = [t for t in TODOS if not t["done"]]
     if not pending:
         speak("No pending tasks.")
         return
     cmd_read_todos("")
     response = listen("Which task number did you complete?")
     try:
-        num = int(re.search(r"\d+", response).group()) - 1
-        todos[num]["done"] = True
-        _save_todos(todos)
+        num = int(DIGITS.search(response).group()) - 1
+        pending[num]["done"] = True
+        EXECUTOR.submit(_save_todos)
         speak(f"Great job! Marked '{pending[num]['task']}' as done.")
     except (AttributeError, IndexError, ValueError):
         speak("I couldn't identify that task number.")
 
 
 # --- System Commands ---
+# Platform-specific actions, resolved once at import
+_PLATFORM = sys.platform
+DEVNULL = subprocess.DEVNULL
+
+
+def _run(*argv: str) -> None:
+    """Start a system command without a shell and without waiting for it."""
+    subprocess.Popen(argv, stdout=DEVNULL, stderr=DEVNULL)
+
+
+def _shutdown_win() -> None:
+    _run("shutdown", "/s", "/t", "5")
+
+
+def _shutdown_posix() -> None:
+    _run("shutdown", "-h", "now")
+
+
+def _restart_win() -> None:
+    _run("shutdown", "/r", "/t", "5")
+
+
+def _restart_posix() -> None:
+    _run("shutdown", "-r", "now")
+
+
+def _lock_win() -> None:
+    import ctypes
+    ctypes.windll.user32.LockWorkStation()
+
+
+def _lock_mac() -> None:
+    _run("pmset", "displaysleepnow")
+
+
+def _lock_linux() -> None:
+    # Fall back whenever the first locker fails, not only when it's missing
+    # (it is often installed with no screensaver daemon running). It returns
+    # immediately, so waiting for its exit status is cheap.
+    try:
+        locked = subprocess.run(
+            ["gnome-screensaver-command", "-l"], stdout=DEVNULL, stderr=DEVNULL
+        ).returncode == 0
+    except FileNotFoundError:
+        locked = False
+    if not locked:
+        _run("xdg-screensaver", "lock")
+
+
+@functools.lru_cache(maxsize=None)
+def _volume_iface():
+    """Windows master-volume COM interface; activating it is slow, so do it once."""
+    from ctypes import cast, POINTER
+    import comtypes
+    from comtypes import CLSCTX_ALL
+    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+    # COM may only have been initialised on the TTS thread so far
+    comtypes.CoInitialize()
+    devices = AudioUtilities.GetSpeakers()
+    interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+    return cast(interface, POINTER(IAudioEndpointVolume))
+
+
+def _volume_up_win() -> None:
+    volume = _volume_iface()
+    current = volume.GetMasterVolumeLevelScalar()
+    volume.SetMasterVolumeLevelScalar(min(1.0, current + 0.1), None)
+
+
+def _volume_down_win() -> None:
+    volume = _volume_iface()
+    current = volume.GetMasterVolumeLevelScalar()
+    volume.SetMasterVolumeLevelScalar(max(0.0, current - 0.1), None)
+
+
+def _volume_up_posix() -> None:
+    _run("amixer", "-D", "pulse", "sset", "Master", "10%+")
+
+
+def _volume_down_posix() -> None:
+    _run("amixer", "-D", "pulse", "sset", "Master", "10%-")
+
+
+if _PLATFORM == "win32":
+    _SYS_ACTIONS = {
+        "shutdown": _shutdown_win,  "restart":  _restart_win,  "lock": _lock_win,
+        "vol_up":   _volume_up_win, "vol_down": _volume_down_win,
+    }
+else:
+    _SYS_ACTIONS = {
+        "shutdown": _shutdown_posix,  "restart":  _restart_posix,
+        "lock":     _lock_mac if _PLATFORM == "darwin" else _lock_linux,
+        "vol_up":   _volume_up_posix, "vol_down": _volume_down_posix,
+    }
+
+
 def cmd_shutdown(_: str) -> None:
     confirm = listen("Are you sure you want to shut down?")
     if "yes" in confirm:
-        speak("Shutting down. Goodbye!")
-        if sys.platform == "win32":
-            os.system("shutdown /s /t 5")
-        else:
-            os.system("shutdown -h now")
+        speak_sync("Shutting down. Goodbye!")
+        _SYS_ACTIONS["shutdown"]()
     else:
         speak("Shutdown cancelled.")
 
@@ -318,62 +932,52 @@ def cmd_shutdown(_: str) -> None:
 def cmd_restart(_: str) -> None:
     confirm = listen("Are you sure you want to restart?")
     if "yes" in confirm:
-        speak("Restarting. See you soon!")
-        if sys.platform == "win32":
-            os.system("shutdown /r /t 5")
-        else:
-            os.system("shutdown -r now")
+        speak_sync("Restarting. See you soon!")
+        _SYS_ACTIONS["restart"]()
     else:
         speak("Restart cancelled.")
 
 
 def cmd_lock(_: str) -> None:
-    speak("Locking the screen.")
-    if sys.platform == "win32":
-        import ctypes
-        ctypes.windll.user32.LockWorkStation()
-    elif sys.platform == "darwin":
-        os.system("pmset displaysleepnow")
-    else:
-        os.system("gnome-screensaver-command -l 2>/dev/null || xdg-screensaver lock")
+    speak_sync("Locking the screen.")
+    _SYS_ACTIONS["lock"]()
 
 
 def cmd_volume_up(_: str) -> None:
-    if sys.platform == "win32":
-        from ctypes import cast, POINTER
-        from comtypes import CLSCTX_ALL
-        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-        devices = AudioUtilities.GetSpeakers()
-        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        volume = cast(interface, POINTER(IAudioEndpointVolume))
-        current = volume.GetMasterVolumeLevelScalar()
-        volume.SetMasterVolumeLevelScalar(min(1.0, current + 0.1), None)
-    else:
-        os.system("amixer -D pulse sset Master 10%+ 2>/dev/null")
+    _SYS_ACTIONS["vol_up"]()
     speak("Volume increased.")
 
 
 def cmd_volume_down(_: str) -> None:
-    if sys.platform == "win32":
-        speak("Volume down not supported without pycaw on Windows. Please adjust manually.")
-    else:
-        os.system("amixer -D pulse sset Master 10%- 2>/dev/null")
+    _SYS_ACTIONS["vol_down"]()
     speak("Volume decreased.")
 
 
 # --- App Launchers ---
 APP_COMMANDS = {
-    "calculator": ("calc" if sys.platform == "win32" else "gnome-calculator"),
-    "notepad":    ("notepad" if sys.platform == "win32" else "gedit"),
-    "paint":      ("mspaint" if sys.platform == "win32" else "kolourpaint"),
-    "file manager": ("explorer" if sys.platform == "win32" else "nautilus"),
+    "calculator": ("calc" if _PLATFORM == "win32" else "gnome-calculator"),
+    "notepad":    ("notepad" if _PLATFORM == "win32" else "gedit"),
+    "paint":      ("mspaint" if _PLATFORM == "win32" else "kolourpaint"),
+    "file manager": ("explorer" if _PLATFORM == "win32" else "nautilus"),
 }
 
+# Launch apps directly, without spawning a shell
+if _PLATFORM == "win32":
+    _launch = os.startfile
+else:
+    def _launch(cmd: str) -> None:
+        subprocess.Popen([cmd], stdout=DEVNULL, stderr=DEVNULL)
+
+
 def cmd_open_app(query: str) -> None:
     for app, cmd in APP_COMMANDS.items():
         if app in query:
+            try:
+                _launch(cmd)
+            except FileNotFoundError:
+                speak(f"It looks like {app} isn't installed.")
+                return
             speak(f"Opening {app}.")
-            subprocess.Popen(cmd, shell=True)
             return
     speak("I don't know how to open that application.")
 
@@ -388,7 +992,6 @@ JOKES = [
 ]
 
 def cmd_joke(_: str) -> None:
-    import random
     speak(random.choice(JOKES))
 
 
@@ -430,8 +1033,7 @@ def cmd_change_assistant_name(_: str) -> None:
     new_name = listen("What would you like to call me?")
     if new_name:
         CONFIG["assistant_name"] = new_name.title()
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(CONFIG, f, indent=4)
+        _save_config()
         speak(f"Okay! You can now call me {CONFIG['assistant_name']}.")
 
 
@@ -439,8 +1041,7 @@ def cmd_change_user_name(_: str) -> None:
     new_name = listen("What's your name?")
     if new_name:
         CONFIG["user_name"] = new_name.title()
-        with open(CONFIG_FILE, "w") as f:
-            json.dump(CONFIG, f, indent=4)
+        _save_config()
         speak(f"Got it! I'll call you {CONFIG['user_name']} from now on.")
 
 
@@ -502,6 +1103,26 @@ COMMAND_TABLE = [
 ]
 
 EXIT_KEYWORDS = ["exit", "quit", "goodbye", "bye", "stop", "shut up"]
+EXIT_INDEX = -1
+
+def _build_automaton() -> "ahocorasick.Automaton":
+    """
+    One automaton over every keyword: value is (handler index, keyword).
+    Exit keywords use EXIT_INDEX so they win over any command; otherwise the
+    earliest COMMAND_TABLE entry wins, as with the original top-down scan.
+    """
+    automaton = ahocorasick.Automaton()
+    for kw in EXIT_KEYWORDS:
+        automaton.add_word(kw, (EXIT_INDEX, kw))
+    for idx, (keywords, _) in enumerate(COMMAND_TABLE):
+        for kw in keywords:
+            if not automaton.exists(kw):
+                automaton.add_word(kw, (idx, kw))
+    automaton.make_automaton()
+    return automaton
+
+
+KEYWORD_AUTOMATON = _build_automaton()
 
 
 # ──────────────────────────────────────────────
@@ -515,20 +1136,23 @@ def dispatch(query: str) -> bool:
     if not query:
         return True
 
+    # Single pass over the query; lowest index = highest priority
+    match = min((idx for _, (idx, _) in KEYWORD_AUTOMATON.iter(query)), default=None)
+
     # Exit check
-    if any(kw in query for kw in EXIT_KEYWORDS):
-        speak(f"Goodbye, {CONFIG['user_name']}! Have a wonderful day.")
+    if match == EXIT_INDEX:
+        speak_sync(f"Goodbye, {CONFIG['user_name']}! Have a wonderful day.")
         return False
 
-    # Find matching command
-    for keywords, handler in COMMAND_TABLE:
-        if any(kw in query for kw in keywords):
-            try:
-                handler(query)
-            except Exception as e:
-                speak("Sorry, something went wrong with that command.")
-                print(f"   [Error] {e}")
-            return True
+    # Run matching command
+    if match is not None:
+        handler = COMMAND_TABLE[match][1]
+        try:
+            handler(query)
+        except Exception as e:
+            speak("Sorry, something went wrong with that command.")
+            print(f"   [Error] {e}")
+        return True
 
     # Fallback — try Wikipedia for unknown queries
     if len(query.split()) >= 3:
@@ -545,6 +1169,8 @@ def dispatch(query: str) -> bool:
 # ──────────────────────────────────────────────
 def run(use_voice: bool = True) -> None:
     """Main event loop."""
+    if use_voice:
+        warm_up_microphone()   # overlaps with TTS engine start-up
     wish_me()
 
     while True: